@@ -3,13 +3,30 @@ import os
 import uuid
 from flask import Flask, request, jsonify
 import sys
+import time
 import requests # Added for Llama.cpp server check
 
 # Add the parent directory to the Python path to import video2title_pipeline
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from video2title_pipeline import video2title_pipeline
+from whisper_transcribe import load_whisper_model
+from transcript_store import TranscriptStore
+from retitle import retitle
+
+# Serving limits, overridable via environment (see gunicorn.conf.py)
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "tiny")
+MODEL_DIR = os.environ.get("MODEL_DIR", "../models") # Relative to restful/, gunicorn chdirs here
+TITLE_PROMPT = os.environ.get("TITLE_PROMPT", "../prompts/prompt.txt")
+FALLBACK_PROMPT = os.environ.get("FALLBACK_PROMPT", "../prompts/visual_prompt.txt") # Used when the video has no usable audio
+TRANSCRIPT_DB = os.environ.get("TRANSCRIPT_DB", "../data/transcripts.db") # Transcripts kept for re-titling
+MAX_REQUEST_MB = int(os.environ.get("MAX_REQUEST_MB", "200")) # base64 adds ~33% on top of the video size
+RETITLE_MAX_ITEMS = int(os.environ.get("RETITLE_MAX_ITEMS", "100")) # Items re-titled per /item/retitle call
+RETITLE_MAX_BATCH = int(os.environ.get("RETITLE_MAX_BATCH", "32")) # Largest batch sent to llama-server at once
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_MB * 1024 * 1024
+
+transcript_store = TranscriptStore(TRANSCRIPT_DB)
 
 # Ensure the temporary directory for videos exists
 TEMP_VIDEO_DIR = "temp_videos"
@@ -30,6 +47,16 @@ def is_llama_cpp_server_running():
         return False
 
 
+def preload_models():
+    """Loads the Whisper model into this process so the first request does not pay for it."""
+    load_whisper_model(WHISPER_MODEL, MODEL_DIR)
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"success": False, "error": f"Request body exceeds {MAX_REQUEST_MB} MB"}), 413
+
+
 @app.route('/item/title_generate', methods=['POST'])
 def title_generate():
     data = request.get_json()
@@ -41,6 +68,11 @@ def title_generate():
         return jsonify({"success": False, "error": "Missing video data"}), 400
     
     keep_intermediate_files = data.get('keep_intermediate_files', False)
+    meta = data.get('meta')
+    if meta is None:
+        meta = {}
+    elif not isinstance(meta, dict):
+        return jsonify({"success": False, "error": "meta must be an object"}), 400
 
     temp_video_path = None # Initialize to None
     try:
@@ -54,20 +86,27 @@ def title_generate():
         print(f"[Debug] Starting pipeline for video: {temp_video_path}")
         pipeline_result = video2title_pipeline(
             video_file=temp_video_path,
-            whisper_model="tiny",
-            model_dir="../models", # This path is relative to restful/app.py, adjust if pipeline expects absolute or different relative
-            title_prompt="../prompts/prompt.txt", # This path is relative to restful/app.py
+            whisper_model=WHISPER_MODEL,
+            model_dir=MODEL_DIR, # This path is relative to restful/app.py, adjust if pipeline expects absolute or different relative
+            title_prompt=TITLE_PROMPT, # This path is relative to restful/app.py
             # save_transcript is True by default in pipeline, so intermediate text files will be created 
             # and then handled by keep_intermediate_files logic within the pipeline.
             # No need to set save_transcript=False here unless specifically intended to never save them.
-            keep_intermediate_files=keep_intermediate_files 
+            keep_intermediate_files=keep_intermediate_files,
+            meta=meta,
+            fallback_prompt=FALLBACK_PROMPT,
+            transcript_store=transcript_store,
+            item_id=str(meta['itemId']) if meta.get('itemId') is not None else None,
+            reprocess=bool(data.get('reprocess', False))
         )
+        print(f"[Debug] Pipeline mode: {pipeline_result.get('mode')}, timings: {pipeline_result.get('timings')}")
         
         generated_title = pipeline_result.get("title", "")
         if not generated_title:
             # pipeline_result will contain paths to intermediate files if created.
             # The pipeline's finally block should handle their deletion if keep_intermediate_files is False.
-            return jsonify({"success": False, "error": "Title generation failed, no title returned"}), 500
+            error = pipeline_result.get("error") or "Title generation failed, no title returned"
+            return jsonify({"success": False, "error": error}), 500
 
         return jsonify({"success": True, "title": generated_title})
 
@@ -82,5 +121,65 @@ def title_generate():
             print(f"[Debug] App: Deleting temporary uploaded video file: {temp_video_path}")
             os.remove(temp_video_path)
 
+@app.route('/item/retitle', methods=['POST'])
+def retitle_items():
+    """Regenerates titles from stored transcripts only; no video is uploaded or processed."""
+    # An empty body re-titles everything; a body that is not valid JSON must not
+    if request.get_data():
+        data = request.get_json(force=True, silent=True)
+        if data is None:
+            return jsonify({"success": False, "error": "Request body is not valid JSON"}), 400
+    else:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Request body must be an object"}), 400
+
+    item_ids = data.get('itemIds')
+    if item_ids is not None and (not isinstance(item_ids, list) or not 1 <= len(item_ids) <= RETITLE_MAX_ITEMS
+                                 or not all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in item_ids)):
+        return jsonify({"success": False, "error": f"itemIds must be a list of 1 to {RETITLE_MAX_ITEMS} ids; omit it for all items"}), 400
+
+    batch_size = data.get('batchSize', 8)
+    if not isinstance(batch_size, int) or isinstance(batch_size, bool) or not 1 <= batch_size <= RETITLE_MAX_BATCH:
+        return jsonify({"success": False, "error": f"batchSize must be an integer between 1 and {RETITLE_MAX_BATCH}"}), 400
+
+    # At most RETITLE_MAX_ITEMS per call; clients call again with "since" while "remaining" > 0
+    limit = data.get('limit', RETITLE_MAX_ITEMS)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= RETITLE_MAX_ITEMS:
+        return jsonify({"success": False, "error": f"limit must be an integer between 1 and {RETITLE_MAX_ITEMS}"}), 400
+
+    # Start of the re-titling round; clients send the returned value back to continue it
+    since = data.get('since')
+    if since is None:
+        since = time.time()
+    elif not isinstance(since, (int, float)) or isinstance(since, bool):
+        return jsonify({"success": False, "error": "since must be the number returned by a previous call"}), 400
+
+    # A missing file would be sent to the LLM as the literal prompt text
+    for prompt_file in (TITLE_PROMPT, FALLBACK_PROMPT):
+        if not os.path.isfile(prompt_file):
+            print(f"[Error] Prompt file not found: {prompt_file}")
+            return jsonify({"success": False, "error": f"Prompt file not found: {prompt_file}"}), 500
+
+    try:
+        results, failed, remaining = retitle(
+            transcript_store,
+            title_prompt=TITLE_PROMPT,
+            fallback_prompt=FALLBACK_PROMPT,
+            item_ids=[str(item_id) for item_id in item_ids] if item_ids is not None else None,
+            force=bool(data.get('force', False)),
+            batch_size=batch_size,
+            limit=limit,
+            since=since
+        )
+        items = [{"itemIds": r["itemIds"], "title": r["title"]} for r in results]
+        failed = [{"itemIds": f["itemIds"]} for f in failed]
+        return jsonify({"success": True, "items": items, "failed": failed, "remaining": remaining, "since": since})
+    except Exception as e:
+        print(f"[Error] Exception in retitle_items: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=80, debug=True)
+    # Local development only; production runs under gunicorn (see gunicorn.conf.py and start.sh).
+    # Single-threaded like a gunicorn sync worker: one pipeline at a time per process.
+    app.run(host='0.0.0.0', port=80, debug=os.environ.get("FLASK_DEBUG", "0") == "1", threaded=False)
@@ -0,0 +1,63 @@
+# Gunicorn configuration for serving restful/app.py in production.
+# Usage: gunicorn -c restful/gunicorn.conf.py app:app
+#
+# Every worker is a separate sync process with its own Whisper model (loaded in
+# post_worker_init) that runs one pipeline at a time. On SIGTERM gunicorn stops
+# accepting connections and waits up to graceful_timeout for in-flight
+# pipelines to finish.
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__)) # app.py resolves ../models and ../prompts from here
+
+bind = os.environ.get("BIND", "0.0.0.0:80")
+workers = int(os.environ.get("WORKERS", max(1, multiprocessing.cpu_count() // 2)))
+# Sync workers handle one request per process, so concurrency per worker is
+# bounded at one pipeline and `timeout` below is a real per-request deadline.
+# Sync workers also read the request body themselves: bound directly to :80
+# with up to MAX_REQUEST_MB uploads and no buffering proxy, a few slow
+# uploaders can occupy every worker. Put a buffering reverse proxy (e.g. nginx
+# with proxy_request_buffering on) in front when clients are not on a fast LAN.
+worker_class = "sync"
+
+# torch defaults to one thread per core in every process; split the cores
+# between workers so they do not oversubscribe the CPU
+torch_threads = int(os.environ.get("TORCH_THREADS", max(1, multiprocessing.cpu_count() // workers)))
+
+# Request limits: a sync worker still busy with one request after `timeout`
+# seconds is killed by the master (worker_abort) and the client gets an error;
+# the interface allows 600 seconds per call. Request body size is capped by
+# MAX_REQUEST_MB in app.py; the limits below guard headers only.
+timeout = int(os.environ.get("REQUEST_TIMEOUT", "600"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", timeout))
+limit_request_line = 4094
+limit_request_fields = 100
+limit_request_field_size = 8190
+
+# Recycle workers periodically to bound memory growth from torch/whisper
+max_requests = int(os.environ.get("MAX_REQUESTS", "500"))
+max_requests_jitter = 50
+
+# Models are loaded after fork, never in the master (torch does not survive fork well)
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    import torch
+    from app import preload_models
+    torch.set_num_threads(torch_threads)
+    worker.log.info("Worker %s: preloading models with %s torch threads", worker.pid, torch_threads)
+    preload_models()
+    worker.log.info("Worker %s: models ready", worker.pid)
+
+
+def worker_exit(server, worker):
+    worker.log.info("Worker %s: exited", worker.pid)
+
+
+def worker_abort(worker):
+    worker.log.warning("Worker %s: aborted after exceeding %s seconds", worker.pid, timeout)
@@ -0,0 +1,188 @@
+import argparse
+import base64
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RESTFUL_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONF = os.path.join(RESTFUL_DIR, "gunicorn.conf.py")
+
+# Clip built from the audio.mp3 in the repo root when no --video is given
+DEFAULT_AUDIO = os.path.join(RESTFUL_DIR, "..", "audio.mp3")
+DEFAULT_VIDEO = os.path.join(RESTFUL_DIR, "load_test_clip.mp4")
+SILENT_VIDEO = os.path.join(RESTFUL_DIR, "load_test_clip_noaudio.mp4")
+
+
+def build_test_clip(audio_file=DEFAULT_AUDIO, output_file=DEFAULT_VIDEO, seconds=20):
+    """Builds a small mp4 (solid colour video + repo audio) so the test needs no external media."""
+    if os.path.exists(output_file):
+        return output_file
+    command = [
+        "ffmpeg",
+        "-f", "lavfi", "-i", "color=c=blue:s=320x240:r=25",
+        "-i", audio_file,
+        "-t", str(seconds),
+        "-shortest",
+        "-c:v", "libx264", "-preset", "ultrafast",
+        "-c:a", "aac",
+        "-y", output_file
+    ]
+    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return output_file
+
+
+def build_silent_clip(video_file, output_file=SILENT_VIDEO):
+    """Copies the video stream only, giving the same clip with no audio track."""
+    command = ["ffmpeg", "-i", video_file, "-an", "-c:v", "copy", "-y", output_file]
+    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return output_file
+
+
+def compare_fallback(video_file, runs=3):
+    """
+    Runs the pipeline in-process on the clip and on the same clip without audio and
+    prints the median pre-LLM time of each path, so the fallback's saving is measured
+    rather than assumed. Title generation is excluded because it costs the same on both.
+    """
+    sys.path.append(os.path.abspath(os.path.join(RESTFUL_DIR, '..')))
+    from video2title_pipeline import video2title_pipeline
+
+    silent_file = build_silent_clip(video_file)
+    rows = []
+    for label, path in [("full (audio)", video_file), ("fallback (no audio)", silent_file)]:
+        totals = []
+        for _ in range(runs + 1): # First run loads the Whisper model and is discarded
+            result = video2title_pipeline(
+                video_file=path,
+                model_dir=os.path.join(RESTFUL_DIR, "..", "models"),
+                title_prompt=os.path.join(RESTFUL_DIR, "..", "prompts", "prompt.txt"),
+                fallback_prompt=os.path.join(RESTFUL_DIR, "..", "prompts", "visual_prompt.txt"),
+                save_transcript=False
+            )
+            stages = {k: v for k, v in result["timings"].items() if k != "generate_title"}
+            totals.append(sum(stages.values()))
+        totals = sorted(totals[1:])
+        rows.append((label, result["mode"], totals[len(totals) // 2], stages))
+
+    print("=" * 60)
+    for label, mode, median, stages in rows:
+        stage_text = ", ".join(f"{k} {v:.2f}s" for k, v in stages.items())
+        print(f"{label:<20} mode={mode:<16} median {median:.2f}s  ({stage_text})")
+    if rows[1][2] > 0:
+        print(f"Fallback is {rows[0][2] / rows[1][2]:.1f}x cheaper before title generation")
+    print("=" * 60)
+    return rows
+
+
+def send_request(api_url, payload, timeout):
+    """Sends one title_generate request and returns (status_code, latency_seconds)."""
+    start = time.time()
+    try:
+        response = requests.post(api_url, json=payload, timeout=timeout)
+        status = response.status_code
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed: {e}")
+        status = None
+    return status, time.time() - start
+
+
+def run_load(api_url, payload, total_requests, concurrency, timeout=600):
+    """Fires total_requests requests with the given client concurrency and returns the stats."""
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: send_request(api_url, payload, timeout), range(total_requests)))
+    elapsed = time.time() - start
+
+    latencies = sorted(latency for status, latency in results if status == 200)
+    ok = len(latencies)
+    return {
+        "elapsed": elapsed,
+        "ok": ok,
+        "failed": total_requests - ok,
+        "throughput": ok / elapsed,
+        "p50": latencies[len(latencies) // 2] if latencies else None,
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+    }
+
+
+def start_server(workers, port):
+    """Starts gunicorn with the given worker count and waits until it answers."""
+    # Keep load test rows out of the real transcript store
+    env = dict(os.environ, WORKERS=str(workers), BIND=f"127.0.0.1:{port}",
+               TRANSCRIPT_DB=os.path.join(tempfile.mkdtemp(prefix="load_test_"), "transcripts.db"))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONF, "app:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        try:
+            requests.post(f"http://127.0.0.1:{port}/item/title_generate", json={}, timeout=5)
+            return server
+        except requests.exceptions.RequestException:
+            time.sleep(1)
+    stop_server(server)
+    raise RuntimeError(f"gunicorn with {workers} workers did not start")
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    server.wait(timeout=700)
+
+
+def sweep(worker_counts, requests_per_worker, video_file, port=8090):
+    """Runs the same load against 1..N workers and prints a throughput table."""
+    with open(video_file, "rb") as f:
+        payload = {"video": base64.b64encode(f.read()).decode('utf-8'), "meta": {"itemId": "load_test"}}
+    # Reprocess every time so the transcript store does not turn the test into a cache benchmark
+    payload["reprocess"] = True
+    api_url = f"http://127.0.0.1:{port}/item/title_generate"
+
+    rows = []
+    for workers in worker_counts:
+        print(f"Starting gunicorn with {workers} workers...")
+        server = start_server(workers, port)
+        try:
+            # Warm up every worker once so model loading is not measured
+            run_load(api_url, payload, workers, workers)
+            stats = run_load(api_url, payload, requests_per_worker * workers, workers)
+        finally:
+            stop_server(server)
+        rows.append((workers, stats))
+        print(f"  {workers} workers: {stats['throughput']:.3f} req/s ({stats['ok']} ok, {stats['failed']} failed)")
+
+    base = rows[0][1]["throughput"] or None
+    print("=" * 60)
+    print(f"{'workers':>8} {'req/s':>8} {'speedup':>8} {'p50 s':>8} {'p95 s':>8} {'failed':>7}")
+    for workers, stats in rows:
+        speedup = f"{stats['throughput'] / base:.2f}x" if base else "-"
+        p50 = f"{stats['p50']:.2f}" if stats["p50"] is not None else "-"
+        p95 = f"{stats['p95']:.2f}" if stats["p95"] is not None else "-"
+        print(f"{workers:>8} {stats['throughput']:>8.3f} {speedup:>8} {p50:>8} {p95:>8} {stats['failed']:>7}")
+    print("=" * 60)
+    return rows
+
+
+if __name__ == "__main__":
+    # Requires ffmpeg, the Python requirements and a running llama-server on :8080.
+    # Each worker count gets its own gunicorn on --port; client concurrency equals
+    # the worker count, so throughput should grow roughly linearly until the CPU
+    # (or llama-server) saturates.
+    parser = argparse.ArgumentParser(description="Throughput sweep for /item/title_generate over worker counts")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to test")
+    parser.add_argument("--requests-per-worker", type=int, default=5, help="Measured requests per worker")
+    parser.add_argument("--video", default=None, help="Video to send; defaults to a clip built from audio.mp3")
+    parser.add_argument("--port", type=int, default=8090, help="Port for the gunicorn under test")
+    parser.add_argument("--compare-fallback", action="store_true",
+                        help="Instead of the sweep, time the full path against the no-audio fallback in-process")
+    args = parser.parse_args()
+
+    video = args.video or build_test_clip()
+    if args.compare_fallback:
+        compare_fallback(video)
+    else:
+        sweep([int(n) for n in args.workers.split(",")], args.requests_per_worker, video, port=args.port)
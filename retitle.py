@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import time
+from text2title import generate_titles, resolve_prompt, LLM_MODEL
+from transcript_store import TranscriptStore, hash_text, select_sentences
+from video2context import compose_visual_context
+
+def title_source_text(item, sentence_count=None):
+    """
+    返回生成标题用的文本：transcript 记录按 sentence_count 截取转录文本，
+    visual_fallback 记录用保存的画面信息和最近一次的 meta 重新组合
+    """
+    if item["mode"] == "visual_fallback" and item["visual"] is not None:
+        return compose_visual_context(item["visual"], item["meta"])
+    text, _ = select_sentences(item, sentence_count)
+    return text
+
+def retitle(store,
+            title_prompt="prompts/prompt.txt",
+            fallback_prompt="prompts/visual_prompt.txt",
+            item_ids=None,
+            force=False,
+            batch_size=8,
+            model=LLM_MODEL,
+            sentence_count=None,
+            limit=None,
+            since=None):
+    """
+    为转录存储中的视频重新生成标题，只调用 LLM，不再处理音视频
+
+    参数：
+        store (TranscriptStore): 转录存储
+        title_prompt (str, optional): 转录文本使用的提示词或提示词文件路径
+        fallback_prompt (str, optional): 降级流程（画面/元数据）使用的提示词或文件路径
+        item_ids (list, optional): 只处理这些 itemId，None 为全部
+        force (bool, optional): 为 False 时只处理提示词或模型发生变化的记录
+        batch_size (int, optional): 每次请求 llama-server 的文本数量，至少为 1
+        model (str, optional): 请求使用的模型名称
+        sentence_count (int, optional): 转录文本使用的句子数量，None 为全部
+        limit (int, optional): 本次最多处理的记录数，None 为不限；最久未更新的记录优先
+        since (float, optional): 本轮开始的时间戳，只处理 updated_at 早于它的记录。
+                                 分多次调用时传入同一个值，已处理或已失败的记录不会再次出现，
+                                 force=True 时也能处理完；None 为当前时间
+
+    返回：
+        tuple: (更新列表, 失败列表, 本轮剩余未处理的记录数)，更新列表每项为
+               {"content_hash", "itemIds", "title", "previous_title"}，
+               失败列表每项为 {"content_hash", "itemIds"}
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    prompts = {"transcript": title_prompt, "visual_fallback": fallback_prompt}
+    prompt_hashes = {mode: hash_text(resolve_prompt(p)) for mode, p in prompts.items()}
+
+    items = store.list_items(item_ids, updated_before=time.time() if since is None else since)
+    if not force:
+        items = [item for item in items
+                 if item["prompt_hash"] != prompt_hashes[item["mode"]] or item["llm_model"] != model]
+    pending = items if limit is None else items[:limit]
+    remaining = len(items) - len(pending)
+    print(f"[Retitle] 需要重新生成标题的记录: {len(items)}，本次处理: {len(pending)}")
+
+    updated, failed = [], []
+    start_time = time.time()
+    for mode, prompt in prompts.items():
+        mode_items = [item for item in pending if item["mode"] == mode]
+        for i in range(0, len(mode_items), batch_size):
+            batch = mode_items[i:i + batch_size]
+            texts = [title_source_text(item, sentence_count) for item in batch]
+            titles = generate_titles(prompt=prompt, texts=texts, model=model)
+            for item, title in zip(batch, titles):
+                if not title:
+                    # 保留旧标题但更新时间，本轮不再重试，也不会挡住后面的记录
+                    print(f"[Retitle] 标题生成失败: {item['item_ids'] or item['content_hash']}")
+                    store.touch(item["content_hash"])
+                    failed.append({"content_hash": item["content_hash"], "itemIds": item["item_ids"]})
+                    continue
+                store.update_title(item["content_hash"], title, prompt_hashes[mode], model)
+                updated.append({
+                    "content_hash": item["content_hash"],
+                    "itemIds": item["item_ids"],
+                    "title": title,
+                    "previous_title": item["title"],
+                })
+    print(f"[Retitle] 更新 {len(updated)} 条标题，失败 {len(failed)} 条，耗时 {time.time() - start_time:.2f} 秒")
+    return updated, failed, remaining
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="使用已保存的转录文本重新生成标题")
+    parser.add_argument("--db", default="data/transcripts.db", help="转录存储数据库路径")
+    parser.add_argument("--prompt", default="prompts/prompt.txt", help="转录文本使用的提示词文件")
+    parser.add_argument("--fallback-prompt", default="prompts/visual_prompt.txt", help="降级流程使用的提示词文件")
+    parser.add_argument("--item-id", action="append", dest="item_ids", help="只处理指定 itemId，可重复")
+    parser.add_argument("--force", action="store_true", help="提示词和模型未变化的记录也重新生成")
+    parser.add_argument("--batch-size", type=int, default=8, help="每次请求 llama-server 的文本数量")
+    parser.add_argument("--model", default=LLM_MODEL, help="请求使用的模型名称")
+    parser.add_argument("--sentence-count", type=int, default=None, help="转录文本使用的句子数量，默认全部")
+    parser.add_argument("--limit", type=int, default=None, help="最多处理的记录数，默认全部")
+    parser.add_argument("--since", type=float, default=None,
+                        help="本轮开始的时间戳，分批运行时传入上次输出的值以继续同一轮")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    # 不存在的路径会被当作提示词原文发送并记录哈希，这里直接报错
+    for option, path in (("--prompt", args.prompt), ("--fallback-prompt", args.fallback_prompt)):
+        if not os.path.isfile(path):
+            parser.error(f"{option} file not found: {path}")
+
+    since = time.time() if args.since is None else args.since
+    results, failed, remaining = retitle(
+        TranscriptStore(args.db),
+        title_prompt=args.prompt,
+        fallback_prompt=args.fallback_prompt,
+        item_ids=args.item_ids,
+        force=args.force,
+        batch_size=args.batch_size,
+        model=args.model,
+        sentence_count=args.sentence_count,
+        limit=args.limit,
+        since=since
+    )
+    for r in results:
+        label = ",".join(r["itemIds"]) or r["content_hash"][:12]
+        print(f"{label}: {r['previous_title']} -> {r['title']}")
+    for f in failed:
+        print(f"{','.join(f['itemIds']) or f['content_hash'][:12]}: 标题生成失败，保留原标题")
+    if remaining:
+        print(f"还有 {remaining} 条记录未处理，可加上 --since {since} 再次运行")
@@ -6,7 +6,8 @@ echo "Starting llama-server on port 8080..."
 mkdir -p /logs
 
 # Redirect stdout and stderr to files
-llama-server -hf Qwen/Qwen2.5-0.5B-Instruct-GGUF --alias llm --port 8080 > logs/llama_server.log 2> logs/llama_server_error.log &
+# -np: parallel slots used by batched re-titling (LLM_PARALLEL); -c is split between slots, 4096 tokens each
+llama-server -hf Qwen/Qwen2.5-0.5B-Instruct-GGUF --alias llm --port 8080 -np ${LLM_PARALLEL:-4} -c $((4096 * ${LLM_PARALLEL:-4})) > logs/llama_server.log 2> logs/llama_server_error.log &
 
-echo "Starting Flask app on port 80..."
-python restful/app.py
\ No newline at end of file
+echo "Starting gunicorn (${WORKERS:-auto} workers) on port 80..."
+gunicorn -c restful/gunicorn.conf.py app:app
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live in the repository root, not in a package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,123 @@
+import pytest
+
+import video2title_pipeline as pipeline
+from transcript_store import TranscriptStore
+
+VISUAL = {"duration": 20.0, "tags": {}, "frames": "共 4 个关键帧，整体明亮"}
+SPEECH = [{"start": 0.0, "end": 2.0, "text": "大家好", "no_speech_prob": 0.05, "avg_logprob": -0.3}]
+MUSIC = [{"start": 0.0, "end": 2.0, "text": "谢谢观看", "no_speech_prob": 0.85, "avg_logprob": -1.4}]
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"fake video")
+    return str(path)
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Replaces every ffmpeg/Whisper/LLM stage with a stub and records which ones ran."""
+    state = {
+        "has_audio": True,
+        "silent": False,
+        "speech": True,
+        "transcribe": ("大家好", ["大家好"], 0.1, SPEECH),
+        "calls": [],
+    }
+
+    def record(name, value):
+        def stub(*args, **kwargs):
+            state["calls"].append(name)
+            return value() if callable(value) else value
+        return stub
+
+    monkeypatch.setattr(pipeline, "probe_video", record("probe", lambda: {"duration": 20.0, "has_audio": state["has_audio"], "tags": {}}))
+    monkeypatch.setattr(pipeline, "is_audio_silent", record("silence_check", lambda: state["silent"]))
+    monkeypatch.setattr(pipeline, "video_to_mp3", record("audio_extract", True))
+    monkeypatch.setattr(pipeline, "detect_speech", record("speech_check", lambda: state["speech"]))
+    monkeypatch.setattr(pipeline, "whisper_transcribe", record("transcribe", lambda: state["transcribe"]))
+    monkeypatch.setattr(pipeline, "extract_visual_info", record("visual_context", VISUAL))
+    monkeypatch.setattr(pipeline, "generate_title", lambda prompt=None, text=None: f"{prompt}|{text}")
+    return state
+
+
+def run(video, **kwargs):
+    kwargs.setdefault("title_prompt", "T")
+    kwargs.setdefault("fallback_prompt", "F")
+    return pipeline.video2title_pipeline(video, save_transcript=False, **kwargs)
+
+
+def test_transcript_path(video, stages):
+    result = run(video)
+    assert result["mode"] == "transcript"
+    assert result["title"] == "T|大家好"
+    assert stages["calls"] == ["probe", "silence_check", "audio_extract", "speech_check", "transcribe"]
+    assert "visual_context" not in result["timings"]
+
+
+def test_no_audio_stream_skips_audio_work(video, stages):
+    stages["has_audio"] = False
+    result = run(video, meta={"title": "原标题"})
+    assert result["mode"] == "visual_fallback"
+    assert result["title"].startswith("F|")
+    assert "原标题：原标题" in result["title"]
+    assert stages["calls"] == ["probe", "visual_context"]
+    assert "transcribe" not in result["timings"] and "visual_context" in result["timings"]
+
+
+def test_silent_video_skips_audio_extraction(video, stages):
+    stages["silent"] = True
+    result = run(video)
+    assert result["mode"] == "visual_fallback"
+    assert stages["calls"] == ["probe", "silence_check", "visual_context"]
+
+
+def test_music_without_speech_skips_transcription(video, stages):
+    stages["speech"] = False
+    result = run(video)
+    assert result["mode"] == "visual_fallback"
+    assert "transcribe" not in stages["calls"]
+
+
+def test_empty_transcript_falls_back(video, stages):
+    stages["transcribe"] = ("  ", [], 0.1, [])
+    assert run(video)["mode"] == "visual_fallback"
+
+
+def test_hallucinated_transcript_falls_back(video, stages):
+    stages["transcribe"] = ("谢谢观看", ["谢谢观看"], 0.1, MUSIC)
+    result = run(video)
+    assert result["mode"] == "visual_fallback"
+    assert "谢谢观看" not in result["title"]
+
+
+def test_whisper_error_is_reported_not_hidden(video, stages, tmp_path):
+    stages["transcribe"] = (None, None, 0.1, None)
+    store = TranscriptStore(str(tmp_path / "t.db"))
+    result = run(video, transcript_store=store)
+    assert result["mode"] == "transcribe_error"
+    assert result["error"]
+    assert result["title"] is None
+    assert "visual_context" not in stages["calls"]
+    assert store.list_items() == []
+
+
+def test_fallback_disabled_keeps_old_behaviour(video, stages):
+    stages["transcribe"] = ("", [], 0.1, [])
+    result = run(video, visual_fallback=False)
+    assert result["title"] is None
+    assert "probe" not in stages["calls"]
+
+
+def test_cached_fallback_uses_current_meta(video, stages, tmp_path):
+    stages["has_audio"] = False
+    store = TranscriptStore(str(tmp_path / "t.db"))
+    run(video, transcript_store=store, item_id=1, meta={"title": "旧标题"})
+    stages["calls"].clear()
+
+    result = run(video, transcript_store=store, item_id=2, meta={"title": "新标题"})
+    assert result["cached"] is True
+    assert stages["calls"] == []
+    assert "新标题" in result["title"] and "旧标题" not in result["title"]
+    assert store.get_by_item_id(1)["item_ids"] == ["1", "2"]
@@ -0,0 +1,140 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import retitle as retitle_module
+import text2title
+from retitle import retitle
+from transcript_store import TranscriptStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    store.save("h1", "第一句\n第二句", sentences=[{"start": 0, "end": 1, "text": "第一句"},
+                                                {"start": 1, "end": 2, "text": "第二句"}], item_id="a")
+    store.save("h2", item_id="b", mode="visual_fallback",
+               visual={"duration": 10.0, "tags": {}, "frames": "共 2 个关键帧，整体明亮"},
+               meta={"title": "原标题"})
+    return store
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fake_generate_titles(prompt=None, texts=(), model="llm"):
+        calls.append({"prompt": prompt, "texts": list(texts), "model": model})
+        return [f"{prompt}-{i}" for i in range(len(texts))]
+
+    monkeypatch.setattr(retitle_module, "generate_titles", fake_generate_titles)
+    return calls
+
+
+def test_retitles_everything_new_then_nothing(store, calls):
+    updated, _, remaining = retitle(store, title_prompt="p1", fallback_prompt="f1")
+    assert {u["content_hash"] for u in updated} == {"h1", "h2"}
+    assert remaining == 0
+    assert store.get("h1")["title"] == "p1-0"
+
+    updated, _, _ = retitle(store, title_prompt="p1", fallback_prompt="f1")
+    assert updated == []
+
+
+def test_only_items_with_changed_prompt_are_retitled(store, calls):
+    retitle(store, title_prompt="p1", fallback_prompt="f1")
+    calls.clear()
+
+    updated, _, _ = retitle(store, title_prompt="p2", fallback_prompt="f1")
+    assert [u["content_hash"] for u in updated] == ["h1"]
+    assert updated[0]["previous_title"] == "p1-0"
+    assert [c["prompt"] for c in calls] == ["p2"]
+
+
+def test_changed_model_retitles_all(store, calls):
+    retitle(store, title_prompt="p1", fallback_prompt="f1", model="llm")
+    updated, _, _ = retitle(store, title_prompt="p1", fallback_prompt="f1", model="other")
+    assert len(updated) == 2
+    assert store.get("h2")["llm_model"] == "other"
+
+
+def test_force_retitles_unchanged_items(store, calls):
+    retitle(store, title_prompt="p1", fallback_prompt="f1")
+    updated, _, _ = retitle(store, title_prompt="p1", fallback_prompt="f1", force=True)
+    assert len(updated) == 2
+
+
+def test_limited_rounds_finish_with_force_and_failures(store, monkeypatch):
+    store.save("h3", "第三个", item_id="c")
+    store.save("h4", "第四个", item_id="d")
+
+    def fake_generate_titles(prompt=None, texts=(), model="llm"):
+        # "第三个" never gets a title
+        return ["" if text == "第三个" else f"新-{text}" for text in texts]
+
+    monkeypatch.setattr(retitle_module, "generate_titles", fake_generate_titles)
+    time.sleep(0.01)
+    since = time.time()
+    seen, failed, remaining, rounds = [], [], None, 0
+    while remaining != 0:
+        rounds += 1
+        assert rounds <= 4
+        updated, round_failed, remaining = retitle(store, title_prompt="p1", fallback_prompt="f1",
+                                                   force=True, limit=1, since=since)
+        seen += [u["content_hash"] for u in updated]
+        failed += [f["content_hash"] for f in round_failed]
+
+    assert sorted(seen) == ["h1", "h2", "h4"]
+    assert failed == ["h3"]
+    assert store.get("h3")["title"] is None
+
+
+def test_item_ids_limit_and_batching(store, calls):
+    store.save("h3", "第三个", item_id="c")
+    updated, _, remaining = retitle(store, title_prompt="p1", fallback_prompt="f1", item_ids=["a", "c"], batch_size=1)
+    assert {u["content_hash"] for u in updated} == {"h1", "h3"}
+    assert [len(c["texts"]) for c in calls] == [1, 1]
+    assert remaining == 0
+
+    updated, _, remaining = retitle(store, title_prompt="p2", fallback_prompt="f1", limit=1)
+    assert len(updated) == 1
+    assert remaining == 2
+
+
+def test_source_text_uses_sentence_count_and_current_meta(store, calls):
+    retitle(store, title_prompt="p1", fallback_prompt="f1", sentence_count=1)
+    texts = {c["prompt"]: c["texts"][0] for c in calls}
+    assert texts["p1"] == "第一句"
+    assert "原标题：原标题" in texts["f1"]
+    assert "画面：共 2 个关键帧" in texts["f1"]
+
+
+def test_rejects_non_positive_batch_size(store, calls):
+    with pytest.raises(ValueError):
+        retitle(store, batch_size=0)
+
+
+def test_generate_titles_sends_one_request_per_text(monkeypatch):
+    requests = []
+    lock = threading.Lock()
+
+    def create(**kwargs):
+        with lock:
+            requests.append(kwargs)
+        if kwargs["prompt"].endswith("b"):
+            raise RuntimeError("slot error")
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, text=f" {kwargs['prompt'][-1]}\n")])
+
+    monkeypatch.setattr(text2title, "client",
+                        SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    titles = text2title.generate_titles(prompt="提示", texts=["a", "b", "c"], model="m")
+    assert titles == ["a", "", "c"]
+    assert sorted(r["prompt"] for r in requests) == ["提示\n\na", "提示\n\nb", "提示\n\nc"]
+    assert {r["model"] for r in requests} == {"m"}
+    assert text2title.generate_titles(prompt="提示", texts=[]) == []
+
+    with pytest.raises(RuntimeError):
+        text2title.generate_titles(prompt="提示", texts=["b"])
@@ -0,0 +1,107 @@
+import sqlite3
+
+from transcript_store import TranscriptStore, select_sentences
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.5, "text": "第一句"},
+    {"start": 1.5, "end": 3.0, "text": "第二句"},
+    {"start": 3.0, "end": 4.2, "text": "第三句"},
+]
+
+
+def make_store(tmp_path):
+    return TranscriptStore(str(tmp_path / "db" / "transcripts.db"))
+
+
+def test_save_and_get_roundtrip(tmp_path):
+    store = make_store(tmp_path)
+    store.save("h1", "第一句\n第二句\n第三句", sentences=SEGMENTS, item_id=3443588,
+               language="zh", whisper_model="tiny", meta={"title": "原标题"})
+
+    item = store.get("h1")
+    assert item["mode"] == "transcript"
+    assert item["sentences"] == SEGMENTS
+    assert item["meta"] == {"title": "原标题"}
+    assert item["item_ids"] == ["3443588"]
+    assert item["title"] is None
+    assert store.get("missing") is None
+
+
+def test_save_upsert_keeps_title_meta_and_item_ids(tmp_path):
+    store = make_store(tmp_path)
+    store.save("h1", "old", item_id="a", meta={"title": "t"})
+    store.update_title("h1", "标题", "p1", "llm")
+    store.save("h1", "new", item_id="b")
+
+    item = store.get("h1")
+    assert item["text"] == "new"
+    assert item["title"] == "标题"
+    assert item["prompt_hash"] == "p1"
+    assert item["llm_model"] == "llm"
+    assert item["meta"] == {"title": "t"}
+    assert item["item_ids"] == ["a", "b"]
+
+
+def test_item_ids_map_to_multiple_hashes(tmp_path):
+    store = make_store(tmp_path)
+    store.save("h1", "one", item_id="a")
+    store.save("h2", "two", item_id="b")
+    store.add_item_id("h2", "a")
+    store.add_item_id("h2", "a")
+
+    assert store.get("h2")["item_ids"] == ["b", "a"]
+    assert store.get_by_item_id("a")["content_hash"] == "h2"
+    assert store.get_by_item_id("b")["content_hash"] == "h2"
+    assert {i["content_hash"] for i in store.list_items(["a"])} == {"h1", "h2"}
+    assert [i["content_hash"] for i in store.list_items([1234])] == []
+
+
+def test_list_items_orders_least_recently_updated_first(tmp_path):
+    store = make_store(tmp_path)
+    store.save("h1", "one")
+    store.save("h2", "two")
+    store.update_title("h1", "标题", "p", "llm")
+
+    assert [i["content_hash"] for i in store.list_items()] == ["h2", "h1"]
+
+
+def test_visual_fallback_entry(tmp_path):
+    store = make_store(tmp_path)
+    visual = {"duration": 12.0, "tags": {}, "frames": "共 3 个关键帧，整体明亮"}
+    store.save("h1", item_id="a", mode="visual_fallback", visual=visual, meta={"title": "旧"})
+    store.update_meta("h1", {"title": "新"})
+
+    item = store.get("h1")
+    assert item["text"] == ""
+    assert item["visual"] == visual
+    assert item["meta"] == {"title": "新"}
+    assert item["whisper_model"] is None
+
+
+def test_select_sentences_applies_sentence_count(tmp_path):
+    store = make_store(tmp_path)
+    store.save("h1", "第一句\n第二句\n第三句", sentences=SEGMENTS)
+    item = store.get("h1")
+
+    assert select_sentences(item) == ("第一句\n第二句\n第三句", ["第一句", "第二句", "第三句"])
+    assert select_sentences(item, 2)[0] == "第一句\n第二句"
+    assert select_sentences(item, 10)[0] == "第一句\n第二句\n第三句"
+
+
+def test_migrates_item_id_column_from_old_schema(tmp_path):
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE items (content_hash TEXT PRIMARY KEY, item_id TEXT, mode TEXT NOT NULL,
+                            text TEXT NOT NULL, sentences TEXT, language TEXT, whisper_model TEXT,
+                            title TEXT, prompt_hash TEXT, llm_model TEXT,
+                            created_at REAL NOT NULL, updated_at REAL NOT NULL)
+    """)
+    conn.execute("INSERT INTO items VALUES ('h1', '42', 'transcript', 'text', '[]', NULL, 'tiny', NULL, NULL, NULL, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    store = TranscriptStore(db_path)
+    item = store.get_by_item_id(42)
+    assert item["content_hash"] == "h1"
+    assert item["visual"] is None
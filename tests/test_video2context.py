@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import video2context
+from video2context import KEYFRAME_SIZE, _parse_duration, compose_visual_context, describe_frames
+
+
+def solid_frame(r, g, b):
+    return bytes([r, g, b] * KEYFRAME_SIZE * KEYFRAME_SIZE)
+
+
+def test_describe_frames():
+    assert describe_frames([]) == ""
+    assert describe_frames([solid_frame(20, 40, 200), solid_frame(200, 30, 30)]) == \
+        "整体明亮，色彩鲜艳，主色调为蓝色、红色"
+    assert describe_frames([solid_frame(10, 10, 10)]) == "整体偏暗，色彩素淡"
+
+
+def test_parse_duration():
+    assert _parse_duration(36) == 36.0
+    assert _parse_duration("36.5") == 36.5
+    assert _parse_duration("36s") is None
+    assert _parse_duration(None) is None
+    assert _parse_duration({}) is None
+
+
+def test_compose_meta_has_priority_over_tags():
+    visual = {"duration": 12.3, "tags": {"title": "内嵌标题", "genre": "Music", "comment": "内嵌简介"},
+              "frames": "共 3 个关键帧，整体明亮"}
+    context = compose_visual_context(visual, {"title": "原标题", "content": "-", "duration": "36s"})
+    assert context.splitlines() == [
+        "视频时长：12 秒",
+        "原标题：原标题",
+        "分类：Music",
+        "简介：内嵌简介",
+        "画面：共 3 个关键帧，整体明亮",
+    ]
+
+
+def test_compose_without_meta_or_frames():
+    assert compose_visual_context({"duration": None, "tags": {}, "frames": ""}) == ""
+    assert compose_visual_context({"duration": 5.0, "tags": {}, "frames": ""}, {"duration": 36}) == "视频时长：36 秒"
+
+
+def test_sample_keyframes_passes_through_timestamps(monkeypatch):
+    commands = []
+    frames = b"".join(solid_frame(i, i, i) for i in range(10))
+
+    def fake_run(command, **kwargs):
+        commands.append(command)
+        return SimpleNamespace(returncode=0, stdout=frames, stderr=b"")
+
+    monkeypatch.setattr(video2context.subprocess, "run", fake_run)
+    count, sampled = video2context.sample_keyframes("video.mp4", max_frames=4)
+
+    command = commands[0]
+    assert command[command.index("-skip_frame") + 1] == "nokey"
+    assert command[command.index("-vsync") + 1] == "0"
+    assert count == 10
+    assert [frame[0] for frame in sampled] == [0, 2, 5, 7]
+
+
+def test_is_audio_silent_skips_video_decoding(monkeypatch):
+    commands = []
+
+    def fake_run(command, **kwargs):
+        commands.append(command)
+        return SimpleNamespace(returncode=0, stdout="", stderr="[Parsed_volumedetect_0] max_volume: -91.0 dB\n")
+
+    monkeypatch.setattr(video2context.subprocess, "run", fake_run)
+    assert video2context.is_audio_silent("video.mp4") is True
+    assert "-vn" in commands[0]
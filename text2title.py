@@ -1,9 +1,16 @@
 import time
 import openai
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 client = openai.OpenAI(base_url="http://localhost:8080/v1", api_key="sk-no-key-required")
 
+# 对应 llama-server 启动时设置的 --alias；换模型时可通过环境变量区分
+LLM_MODEL = os.environ.get("LLM_MODEL", "llm")
+DEFAULT_PROMPT = "Generate a title based on the following text:"
+# 同时发往 llama-server 的请求数，应与启动参数 -np（并行 slot 数）一致
+LLM_PARALLEL = int(os.environ.get("LLM_PARALLEL", "4"))
+
 def time_decorator(func):
     def wrapper(*args, **kwargs):
         start = time.time()
@@ -24,25 +31,30 @@ def log_io(prompt_content, text_content, title):
     print(title)
     print("="*50 + "\n")
 
-@time_decorator
-def generate_title(prompt=None, text=None):
-    def _read_if_file(param):
-        if param is None:
-            return None
-        if os.path.isfile(param):
-            with open(param, 'r', encoding='utf-8') as f:
-                return f.read()
-        return param
+def read_if_file(param):
+    """Return the file content if param is an existing file path, otherwise param itself"""
+    if param is None:
+        return None
+    if os.path.isfile(param):
+        with open(param, 'r', encoding='utf-8') as f:
+            return f.read()
+    return param
 
-    prompt_content = _read_if_file(prompt) or "Generate a title based on the following text:"
-    text_content = _read_if_file(text) or ""
+def resolve_prompt(prompt=None):
+    """Return the prompt text actually sent to the LLM for a prompt string or file path"""
+    return read_if_file(prompt) or DEFAULT_PROMPT
+
+@time_decorator
+def generate_title(prompt=None, text=None, model=LLM_MODEL):
+    prompt_content = resolve_prompt(prompt)
+    text_content = read_if_file(text) or ""
     full_prompt = f"{prompt_content}\n\n{text_content}"
 
     print(f"[Debug] Generating title with prompt length: {len(prompt_content)}, text length: {len(text_content)}")
     try:
         print(f"[Debug] Sending request to Llama.cpp API at {client.base_url}")
         response = client.completions.create(
-            model="llm",
+            model=model,
             prompt=full_prompt,
             max_tokens=20,
             temperature=0.7,
@@ -54,6 +66,38 @@ def generate_title(prompt=None, text=None):
         print(f"[Error] Failed to generate title: {str(e)}")
         raise  # 重新抛出异常以便 Flask 视图函数捕获
 
+@time_decorator
+def generate_titles(prompt=None, texts=(), model=LLM_MODEL):
+    """
+    Generate one title per text. Each text is sent as its own completion request,
+    LLM_PARALLEL at a time, so llama-server decodes them in parallel slots (-np).
+    A failed request yields an empty title; if every request fails the error is raised.
+    """
+    prompt_content = resolve_prompt(prompt)
+    full_prompts = [f"{prompt_content}\n\n{text}" for text in texts]
+    if not full_prompts:
+        return []
+
+    def complete(full_prompt):
+        try:
+            response = client.completions.create(
+                model=model,
+                prompt=full_prompt,
+                max_tokens=20,
+                temperature=0.7,
+            )
+            return response.choices[0].text.strip(), None
+        except Exception as e:
+            print(f"[Error] Failed to generate title: {str(e)}")
+            return "", e
+
+    print(f"[Debug] Generating {len(full_prompts)} titles, {LLM_PARALLEL} in parallel, with prompt length: {len(prompt_content)}")
+    with ThreadPoolExecutor(max_workers=max(1, min(LLM_PARALLEL, len(full_prompts)))) as executor:
+        results = list(executor.map(complete, full_prompts))
+    errors = [error for _, error in results if error is not None]
+    if len(errors) == len(results):
+        raise errors[-1]
+    return [title for title, _ in results]
 
 if __name__ == "__main__":
     # 例子1：直接传字符串
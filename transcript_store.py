@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    计算文件内容的 sha256，用作转录记录的主键
+    :param path: 文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_text(text):
+    """计算文本的 sha256，用于判断提示词是否变化"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def select_sentences(item, sentence_count=None):
+    """
+    从转录记录中取出句子列表和按 sentence_count 截取后的文本，规则与 whisper_transcribe 一致
+    :param item: TranscriptStore 返回的记录
+    :param sentence_count: 使用的句子数量，None 为全部
+    :return: (截取后的文本, 全部句子文本列表)
+    """
+    sentences = [sentence["text"] for sentence in item["sentences"]]
+    if not sentences:
+        return item["text"], []
+    if sentence_count and isinstance(sentence_count, int) and 0 < sentence_count < len(sentences):
+        return "\n".join(sentences[:sentence_count]), sentences
+    return "\n".join(sentences), sentences
+
+class TranscriptStore:
+    """
+    基于 SQLite 的转录文本存储，按视频内容哈希索引，并单独维护 itemId 与内容哈希的对应关系
+
+    transcript 记录保存完整转录文本和带时间戳的句子；visual_fallback 记录只保存和视频本身
+    有关的画面/容器信息（visual），客户端 meta 单独保存，生成标题时再与当次请求的 meta 组合。
+    每条记录还保存最近一次生成的标题和所用提示词/模型，修改提示词或更换模型后
+    可直接重新生成标题，无需再跑 ffmpeg 和 Whisper。
+    """
+
+    def __init__(self, db_path="data/transcripts.db"):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        # 每次操作单独建立连接，便于多个 gunicorn worker 共用同一个库
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    content_hash TEXT PRIMARY KEY,
+                    mode TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    sentences TEXT,
+                    visual TEXT,
+                    meta TEXT,
+                    language TEXT,
+                    whisper_model TEXT,
+                    title TEXT,
+                    prompt_hash TEXT,
+                    llm_model TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS item_ids (
+                    item_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (item_id, content_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_item_ids_content_hash ON item_ids (content_hash)")
+
+            # 兼容旧版本的库：补充新列，并把 items.item_id 迁移到 item_ids
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(items)")}
+            for column in ("visual", "meta"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE items ADD COLUMN {column} TEXT")
+            if "item_id" in columns:
+                conn.execute("""
+                    INSERT OR IGNORE INTO item_ids (item_id, content_hash, created_at)
+                    SELECT item_id, content_hash, created_at FROM items WHERE item_id IS NOT NULL
+                """)
+
+    @staticmethod
+    def _row_to_dict(row, item_ids):
+        item = dict(row)
+        item["sentences"] = json.loads(item["sentences"]) if item["sentences"] else []
+        item["visual"] = json.loads(item["visual"]) if item["visual"] else None
+        item["meta"] = json.loads(item["meta"]) if item["meta"] else {}
+        item["item_ids"] = item_ids
+        return item
+
+    def _load(self, conn, rows):
+        if not rows:
+            return []
+        hashes = [row["content_hash"] for row in rows]
+        links = {}
+        # 分批查询，避免超出 SQLite 的参数数量上限
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for link in conn.execute(
+                f"SELECT item_id, content_hash FROM item_ids WHERE content_hash IN ({placeholders}) ORDER BY created_at",
+                chunk
+            ):
+                links.setdefault(link["content_hash"], []).append(link["item_id"])
+        return [self._row_to_dict(row, links.get(row["content_hash"], [])) for row in rows]
+
+    def save(self, content_hash, text="", sentences=None, item_id=None, mode="transcript",
+             language=None, whisper_model=None, visual=None, meta=None):
+        """
+        保存或覆盖一条记录，已有的标题信息保持不变
+        :param content_hash: 视频内容哈希
+        :param text: 完整转录文本（visual_fallback 记录为空字符串）
+        :param sentences: 带时间戳的全部句子，每项为 {"start", "end", "text"}
+        :param item_id: 客户端的 itemId，会追加到对应关系中
+        :param mode: "transcript" 或 "visual_fallback"
+        :param language: 转录语言，None 为自动检测
+        :param whisper_model: 转录使用的模型；visual_fallback 记录没有运行 Whisper 时为 None
+        :param visual: extract_visual_info 的结果，仅 visual_fallback 记录使用
+        :param meta: 客户端 meta，为 None 时保留原值
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                INSERT INTO items (content_hash, mode, text, sentences, visual, meta, language,
+                                   whisper_model, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO UPDATE SET
+                    mode = excluded.mode,
+                    text = excluded.text,
+                    sentences = excluded.sentences,
+                    visual = excluded.visual,
+                    meta = COALESCE(excluded.meta, items.meta),
+                    language = excluded.language,
+                    whisper_model = excluded.whisper_model,
+                    updated_at = excluded.updated_at
+            """, (content_hash, mode, text, json.dumps(sentences or [], ensure_ascii=False),
+                  json.dumps(visual, ensure_ascii=False) if visual is not None else None,
+                  json.dumps(meta, ensure_ascii=False) if meta else None,
+                  language, whisper_model, now, now))
+            if item_id is not None:
+                self._add_item_id(conn, content_hash, item_id)
+
+    @staticmethod
+    def _add_item_id(conn, content_hash, item_id):
+        conn.execute(
+            "INSERT OR IGNORE INTO item_ids (item_id, content_hash, created_at) VALUES (?, ?, ?)",
+            (str(item_id), content_hash, time.time())
+        )
+
+    def add_item_id(self, content_hash, item_id):
+        """把 itemId 关联到已有记录（同一视频以新的 itemId 重新上传时），已有关联保留"""
+        with closing(self._connect()) as conn, conn:
+            self._add_item_id(conn, content_hash, item_id)
+
+    def update_meta(self, content_hash, meta):
+        """保存最近一次请求的客户端 meta，供重新生成 visual_fallback 标题时使用"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE items SET meta = ? WHERE content_hash = ?",
+                         (json.dumps(meta, ensure_ascii=False), content_hash))
+
+    def update_title(self, content_hash, title, prompt_hash, llm_model):
+        """记录最近一次生成的标题及所用提示词哈希和模型"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                UPDATE items SET title = ?, prompt_hash = ?, llm_model = ?, updated_at = ?
+                WHERE content_hash = ?
+            """, (title, prompt_hash, llm_model, time.time(), content_hash))
+
+    def get(self, content_hash):
+        """按内容哈希查询，不存在时返回 None"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM items WHERE content_hash = ?", (content_hash,)).fetchall()
+            items = self._load(conn, rows)
+        return items[0] if items else None
+
+    def get_by_item_id(self, item_id):
+        """按 itemId 查询最近关联的一条记录，不存在时返回 None"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("""
+                SELECT items.* FROM items JOIN item_ids ON items.content_hash = item_ids.content_hash
+                WHERE item_ids.item_id = ? ORDER BY item_ids.created_at DESC LIMIT 1
+            """, (str(item_id),)).fetchall()
+            items = self._load(conn, rows)
+        return items[0] if items else None
+
+    def touch(self, content_hash):
+        """只更新 updated_at，把记录移到 list_items 的末尾（如标题生成失败后不再阻塞队列）"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE items SET updated_at = ? WHERE content_hash = ?", (time.time(), content_hash))
+
+    def list_items(self, item_ids=None, updated_before=None):
+        """
+        列出全部记录，或只列出关联到指定 itemId 的记录；最久未更新的排在前面。
+        updated_before 不为 None 时只返回 updated_at 早于该时间戳的记录
+        """
+        with closing(self._connect()) as conn:
+            where, params = [], []
+            if item_ids:
+                item_ids = [str(item_id) for item_id in item_ids]
+                placeholders = ",".join("?" * len(item_ids))
+                where.append(f"content_hash IN (SELECT content_hash FROM item_ids WHERE item_id IN ({placeholders}))")
+                params.extend(item_ids)
+            if updated_before is not None:
+                where.append("updated_at < ?")
+                params.append(updated_before)
+            sql = "SELECT * FROM items"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            rows = conn.execute(sql + " ORDER BY updated_at", params).fetchall()
+            return self._load(conn, rows)
@@ -0,0 +1,246 @@
+import colorsys
+import json
+import subprocess
+import os
+import time
+
+# 关键帧缩放到的边长（像素），只用于统计颜色和亮度，越小越快
+KEYFRAME_SIZE = 16
+
+# 色相分桶，(上界角度, 颜色名)
+HUE_NAMES = [
+    (15, "红色"), (45, "橙色"), (70, "黄色"), (160, "绿色"),
+    (200, "青色"), (260, "蓝色"), (320, "紫色"), (360, "红色"),
+]
+
+def probe_video(video_file):
+    """
+    使用 ffprobe 读取视频容器信息
+    :param video_file: 输入的视频文件路径
+    :return: dict，包含 duration、has_audio、width、height、tags；失败时返回 None
+    """
+    if not os.path.exists(video_file):
+        print(f"错误：输入文件 {video_file} 不存在")
+        return None
+
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        video_file
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            print(f"ffprobe 失败：{result.stderr}")
+            return None
+        info = json.loads(result.stdout)
+    except FileNotFoundError:
+        print("错误：未找到 ffprobe，请确保已安装 ffmpeg 并添加到系统路径中")
+        return None
+    except Exception as e:
+        print(f"读取视频信息时发生错误：{e}")
+        return None
+
+    streams = info.get("streams", [])
+    fmt = info.get("format", {})
+    video_stream = next((s for s in streams if s.get("codec_type") == "video"), {})
+    try:
+        duration = float(fmt.get("duration", 0))
+    except (TypeError, ValueError):
+        duration = 0.0
+    return {
+        "duration": duration,
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+        "width": video_stream.get("width"),
+        "height": video_stream.get("height"),
+        "tags": {k.lower(): v for k, v in fmt.get("tags", {}).items()},
+    }
+
+def is_audio_silent(audio_file, threshold_db=-50.0):
+    """
+    使用 ffmpeg volumedetect 判断音频是否几乎无声，比直接跑 Whisper 便宜得多
+    可以直接传入视频文件（只解码音轨），静音时连音频提取都可以省掉
+    :param audio_file: 音频或视频文件路径
+    :param threshold_db: 最大音量低于该值（dB）即视为静音
+    :return: 是否静音；无法判断时返回 False，交由 Whisper 处理
+    """
+    command = [
+        "ffmpeg",
+        "-i", audio_file,
+        "-vn",                   # 传入视频时不解码画面
+        "-af", "volumedetect",
+        "-f", "null",
+        "-"
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except Exception as e:
+        print(f"检测音量时发生错误：{e}")
+        return False
+
+    for line in result.stderr.splitlines():
+        if "max_volume:" in line:
+            try:
+                max_volume = float(line.split("max_volume:")[1].split("dB")[0])
+            except ValueError:
+                return False
+            print(f"音频最大音量: {max_volume} dB")
+            return max_volume < threshold_db
+    return False
+
+def sample_keyframes(video_file, max_frames=6):
+    """
+    只解码关键帧（-skip_frame nokey）并缩小到 KEYFRAME_SIZE，均匀抽取若干帧
+    :param video_file: 输入的视频文件路径
+    :param max_frames: 最多返回的关键帧数量
+    :return: (关键帧总数, 抽样帧列表)，每帧为 rgb24 原始字节；失败时返回 (0, [])
+    """
+    command = [
+        "ffmpeg",
+        "-v", "error",
+        "-skip_frame", "nokey",  # 跳过非关键帧，不做完整解码
+        "-i", video_file,
+        "-an",                   # 不处理音频
+        "-vf", f"scale={KEYFRAME_SIZE}:{KEYFRAME_SIZE}",
+        "-vsync", "0",           # 按原时间戳逐帧输出，不按帧率复制关键帧补齐（兼容不支持 -fps_mode 的旧版 ffmpeg）
+        "-f", "rawvideo",
+        "-pix_fmt", "rgb24",
+        "pipe:1"
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        print("错误：未找到 ffmpeg，请确保已安装并添加到系统路径中")
+        return 0, []
+    if result.returncode != 0:
+        print(f"关键帧抽取失败：{result.stderr.decode('utf-8', errors='ignore')}")
+        return 0, []
+
+    frame_bytes = KEYFRAME_SIZE * KEYFRAME_SIZE * 3
+    frames = [result.stdout[i:i + frame_bytes]
+              for i in range(0, len(result.stdout) - frame_bytes + 1, frame_bytes)]
+    if len(frames) <= max_frames:
+        return len(frames), frames
+    step = len(frames) / max_frames
+    return len(frames), [frames[int(i * step)] for i in range(max_frames)]
+
+def describe_frames(frames):
+    """
+    根据关键帧的亮度、饱和度和色相生成简短的画面描述
+    :param frames: sample_keyframes 返回的 rgb24 帧列表
+    :return: 画面描述文本，没有帧时返回空字符串
+    """
+    if not frames:
+        return ""
+
+    hue_counts = {}
+    brightness_total = 0.0
+    saturation_total = 0.0
+    pixel_count = 0
+    for frame in frames:
+        for i in range(0, len(frame), 3):
+            h, s, v = colorsys.rgb_to_hsv(frame[i] / 255, frame[i + 1] / 255, frame[i + 2] / 255)
+            brightness_total += v
+            saturation_total += s
+            pixel_count += 1
+            # 低饱和或过暗的像素不计入主色调
+            if s > 0.25 and v > 0.2:
+                name = next(n for bound, n in HUE_NAMES if h * 360 <= bound)
+                hue_counts[name] = hue_counts.get(name, 0) + 1
+
+    brightness = brightness_total / pixel_count
+    saturation = saturation_total / pixel_count
+    if brightness < 0.3:
+        tone = "整体偏暗"
+    elif brightness > 0.65:
+        tone = "整体明亮"
+    else:
+        tone = "亮度适中"
+    vividness = "色彩鲜艳" if saturation > 0.45 else ("色彩素淡" if saturation < 0.15 else "色彩自然")
+    main_colors = [name for name, _ in sorted(hue_counts.items(), key=lambda x: -x[1])[:2]]
+
+    parts = [tone, vividness]
+    if main_colors:
+        parts.append(f"主色调为{'、'.join(main_colors)}")
+    return "，".join(parts)
+
+def _parse_duration(value):
+    """把时长转成秒数，无法解析（如客户端传入 "36s"）时返回 None"""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def extract_visual_info(video_file, probe=None, max_frames=6):
+    """
+    提取只和视频本身有关的信息（时长、内嵌标签、关键帧画面描述），可直接 JSON 序列化后保存
+    :param video_file: 输入的视频文件路径
+    :param probe: probe_video 的结果，None 时自动读取
+    :param max_frames: 抽样关键帧数量
+    :return: dict，包含 duration、tags、frames（画面描述，可能为空字符串）
+    """
+    start_time = time.time()
+    if probe is None:
+        probe = probe_video(video_file) or {}
+
+    keyframe_count, frames = sample_keyframes(video_file, max_frames=max_frames)
+    description = describe_frames(frames)
+    visual = {
+        "duration": _parse_duration(probe.get("duration")),
+        "tags": probe.get("tags", {}),
+        "frames": f"共 {keyframe_count} 个关键帧，{description}" if description else "",
+    }
+    print(f"画面/元数据上下文构建耗时: {time.time() - start_time:.2f} 秒")
+    return visual
+
+def compose_visual_context(visual, meta=None):
+    """
+    用 extract_visual_info 的结果和请求中的 meta 拼出生成标题用的文本
+    :param visual: extract_visual_info 的结果
+    :param meta: 请求中客户端提供的 meta 字典，可为 None
+    :return: 用于生成标题的文本，可能为空字符串
+    """
+    # 客户端用 "-" 表示空，视为未提供
+    meta = {k: v for k, v in (meta or {}).items() if str(v).strip() not in ("", "-")}
+    tags = visual.get("tags") or {}
+
+    lines = []
+    duration = _parse_duration(meta.get("duration")) or visual.get("duration")
+    if duration:
+        lines.append(f"视频时长：{duration:.0f} 秒")
+
+    # 客户端 meta 优先，其次是视频内嵌的标签
+    fields = [
+        ("原标题", meta.get("title") or tags.get("title")),
+        ("分类", meta.get("categoryLevel1") or tags.get("genre")),
+        ("标签", meta.get("tag") or tags.get("keywords")),
+        ("简介", meta.get("content") or tags.get("comment") or tags.get("description")),
+        ("作者", meta.get("bloggerName") or tags.get("artist")),
+    ]
+    for label, value in fields:
+        if value and str(value).strip():
+            lines.append(f"{label}：{str(value).strip()}")
+
+    if visual.get("frames"):
+        lines.append(f"画面：{visual['frames']}")
+    return "\n".join(lines)
+
+def build_visual_context(video_file, meta=None, probe=None, max_frames=6):
+    """
+    在没有可用音频时，用关键帧、容器元数据和请求中的 meta 拼出生成标题用的文本
+    :param video_file: 输入的视频文件路径
+    :param meta: 请求中客户端提供的 meta 字典，可为 None
+    :param probe: probe_video 的结果，None 时自动读取
+    :param max_frames: 抽样关键帧数量
+    :return: 用于生成标题的文本，可能为空字符串
+    """
+    return compose_visual_context(extract_visual_info(video_file, probe=probe, max_frames=max_frames), meta)
+
+# 示例用法
+if __name__ == "__main__":
+    input_video = "test_video.mp4"  # 替换为你的视频文件路径
+    context = build_visual_context(input_video, meta={"title": "测试视频", "tag": "测试"})
+    print(context)
@@ -4,8 +4,10 @@
 import os
 import time
 from video2mp3 import video_to_mp3
-from whisper_transcribe import whisper_transcribe
-from text2title import generate_title
+from whisper_transcribe import whisper_transcribe, detect_speech, has_speech
+from text2title import generate_title, resolve_prompt, LLM_MODEL
+from video2context import probe_video, is_audio_silent, extract_visual_info, compose_visual_context
+from transcript_store import hash_file, hash_text, select_sentences
 
 def time_decorator(func):
     def wrapper(*args, **kwargs):
@@ -26,7 +28,13 @@ def video2title_pipeline(video_file,
                         save_transcript=True,
                         language=None,
                         sentence_count=None,
-                        keep_intermediate_files=False):
+                        keep_intermediate_files=False,
+                        meta=None,
+                        visual_fallback=True,
+                        fallback_prompt="根据以下视频信息和画面描述，生成一个简短且吸引人的标题:",
+                        transcript_store=None,
+                        item_id=None,
+                        reprocess=False):
     """
     完整的视频转标题流水线：将视频转为音频，然后转录为文本，最后生成标题
     
@@ -41,9 +49,18 @@ def video2title_pipeline(video_file,
         language (str, optional): 指定转录语言，None为自动检测
         sentence_count (int, optional): 使用的句子数量，None为全部
         keep_intermediate_files (bool, optional): 是否保留中间文件（音频、文本），默认为False
+        meta (dict, optional): 请求中客户端提供的视频元数据，供降级流程使用
+        visual_fallback (bool, optional): 无音频、静音或转录为空时，是否改用关键帧和元数据生成标题，默认为True
+        fallback_prompt (str, optional): 降级流程生成标题使用的提示词
+        transcript_store (TranscriptStore, optional): 转录存储；提供时按视频内容哈希复用已有转录，
+            并保存新的转录和生成的标题，供 retitle.py 重新生成标题
+        item_id (str, optional): 客户端的 itemId，随转录一起保存
+        reprocess (bool, optional): 为True时忽略已保存的记录，重新处理音视频并覆盖保存
         
     返回：
-        dict: 包含每个步骤结果的字典，包括音频路径、转录文本和生成的标题
+        dict: 包含每个步骤结果的字典，包括音频路径、转录文本、生成的标题，
+              mode（"transcript"、"visual_fallback" 或 "transcribe_error"）、error（出错原因）、
+              cached（是否命中转录存储）和各步骤耗时 timings
     """
     result = {
         "video_file": video_file,
@@ -51,8 +68,58 @@ def video2title_pipeline(video_file,
         "transcript": None,
         "title": None,
         "transcript_file": None,
-        "sentences_file": None
+        "sentences_file": None,
+        "mode": "transcript",
+        "cached": False,
+        "error": None,
+        "timings": {}
     }
+    timings = result["timings"]
+    content_hash = None
+    item_id = str(item_id) if item_id is not None else None
+
+    def finish_title(prompt, text):
+        step_start = time.time()
+        title = generate_title(prompt=prompt, text=text)
+        timings["generate_title"] = time.time() - step_start
+        if title:
+            result["title"] = title
+            print(f"\n生成的标题: {title}")
+            if transcript_store is not None and content_hash:
+                transcript_store.update_title(content_hash, title, hash_text(resolve_prompt(prompt)), LLM_MODEL)
+        else:
+            print("标题生成失败")
+        return result
+
+    def run_visual_fallback(reason, whisper_ran=False):
+        # 只在确实没有可用语音时调用（无音轨、静音、Whisper 正常返回空结果），
+        # Whisper 出错不会走到这里，因此保存的降级记录不会掩盖临时故障
+        print(f"\n[降级] {reason}，改用关键帧和元数据生成标题")
+        result["mode"] = "visual_fallback"
+        step_start = time.time()
+        visual = extract_visual_info(video_file, probe=probe)
+        context = compose_visual_context(visual, meta)
+        timings["visual_context"] = time.time() - step_start
+        if not context:
+            print("画面/元数据上下文为空，流程终止")
+            return result
+        if transcript_store is not None and content_hash:
+            # 只保存和视频本身有关的信息，meta 单独保存，复用时与当次请求的 meta 重新组合；
+            # 记录运行过的 Whisper 设置，换模型或语言时会重新尝试转录
+            transcript_store.save(content_hash, item_id=item_id, mode="visual_fallback", visual=visual, meta=meta,
+                                  language=language if whisper_ran else None,
+                                  whisper_model=whisper_model if whisper_ran else None)
+        return finish_title(fallback_prompt, context)
+
+    def can_reuse(cached):
+        if cached["mode"] == "visual_fallback":
+            # 旧版本保存的降级记录把 meta 混在文本里，重新处理
+            if cached["visual"] is None:
+                return False
+            # 没有运行过 Whisper 的降级记录（无音轨或静音）与转录设置无关
+            if cached["whisper_model"] is None:
+                return True
+        return cached["whisper_model"] == whisper_model and cached["language"] == language
 
     # Determine audio output path if not provided
     # This ensures output_audio is always defined for cleanup logic
@@ -62,33 +129,101 @@ def video2title_pipeline(video_file,
         output_dir = os.path.dirname(video_file) if os.path.dirname(video_file) else "."
         actual_output_audio = os.path.join(output_dir, f"{base_name}_audio.mp3")
 
+    probe = None
     try:
+        # 同一视频已经转录过时，直接复用保存的文本，跳过 ffmpeg 和 Whisper
+        if transcript_store is not None and os.path.exists(video_file):
+            step_start = time.time()
+            content_hash = hash_file(video_file)
+            cached = None if reprocess else transcript_store.get(content_hash)
+            timings["store_lookup"] = time.time() - step_start
+            if cached and can_reuse(cached):
+                print(f"\n[缓存] 找到已保存的转录记录 {content_hash[:12]}，跳过音视频处理")
+                if item_id is not None and item_id not in cached["item_ids"]:
+                    transcript_store.add_item_id(content_hash, item_id)
+                result["mode"] = cached["mode"]
+                result["cached"] = True
+                if cached["mode"] == "visual_fallback":
+                    if meta and meta != cached["meta"]:
+                        transcript_store.update_meta(content_hash, meta)
+                    context = compose_visual_context(cached["visual"], meta or cached["meta"])
+                    return finish_title(fallback_prompt, context)
+                transcript, sentences = select_sentences(cached, sentence_count)
+                result["transcript"] = transcript
+                result["sentences"] = sentences
+                return finish_title(title_prompt, transcript)
+
+        # 先读取容器信息，没有音轨时无需提取音频和转录
+        if visual_fallback:
+            step_start = time.time()
+            probe = probe_video(video_file)
+            timings["probe"] = time.time() - step_start
+            if probe is not None and not probe["has_audio"]:
+                return run_visual_fallback("视频没有音轨")
+
+            # 直接对视频的音轨做音量检测，静音时连音频提取（mp3 编码）都省掉
+            step_start = time.time()
+            silent = is_audio_silent(video_file)
+            timings["silence_check"] = time.time() - step_start
+            if silent:
+                return run_visual_fallback("音频为静音")
+
         # 步骤1: 视频转音频
         print(f"\n[步骤 1/3] 正在将视频转换为音频: {video_file} -> {actual_output_audio}")
+        step_start = time.time()
         conversion_success = video_to_mp3(video_file, actual_output_audio, bitrate=audio_bitrate)
+        timings["audio_extract"] = time.time() - step_start
         
         if not conversion_success:
             print("视频转音频失败，流程终止")
             return result # audio_file in result is still None or the original if provided and failed
         
         result["audio_file"] = actual_output_audio
+
+        if visual_fallback:
+            # 纯音乐不是静音，先用一次 30 秒窗口的短解码判断有没有人声，避免完整转录
+            step_start = time.time()
+            speech = detect_speech(actual_output_audio, model_name=whisper_model, model_dir=model_dir,
+                                   language=language)
+            timings["speech_check"] = time.time() - step_start
+            if not speech:
+                return run_visual_fallback("未检测到人声", whisper_ran=True)
         
         # 步骤2: 音频转文本
         print(f"\n[步骤 2/3] 正在使用Whisper转录音频为文本: {actual_output_audio}")
-        transcript, sentences, transcribe_time = whisper_transcribe(
+        step_start = time.time()
+        transcript, sentences, transcribe_time, segments = whisper_transcribe(
             actual_output_audio, 
             model_name=whisper_model, 
             model_dir=model_dir,
             language=language,
-            sentence_count=sentence_count
+            sentence_count=sentence_count,
+            return_segments=True
         )
+        timings["transcribe"] = time.time() - step_start
         
-        if not transcript:
+        if transcript is None:
+            # Whisper 出错（而不是音频里没有语音），不降级，作为错误返回以免掩盖故障
             print("音频转文本失败，流程终止")
+            result["mode"] = "transcribe_error"
+            result["error"] = "Whisper transcription failed"
             return result # transcript in result is still None
+
+        # 转录出的片段无声概率高或置信度低时，多半是 Whisper 在音乐上“听出”的幻觉文本
+        if not transcript.strip() or not has_speech(segments):
+            if visual_fallback:
+                return run_visual_fallback("音频转文本结果为空或不是人声", whisper_ran=True)
+            print("音频转文本结果为空，流程终止")
+            return result
         
         result["transcript"] = transcript
         result["sentences"] = sentences
+
+        if transcript_store is not None and content_hash:
+            # 保存完整文本和全部句子，读取时再按 sentence_count 截取
+            full_text = "\n".join(segment["text"] for segment in segments)
+            transcript_store.save(content_hash, full_text, sentences=segments, item_id=item_id,
+                                  mode="transcript", language=language, whisper_model=whisper_model, meta=meta)
         
         if save_transcript:
             audio_dir = os.path.dirname(result["audio_file"])
@@ -111,17 +246,12 @@ def video2title_pipeline(video_file,
         
         # 步骤3: 文本生成标题
         print(f"\n[步骤 3/3] 根据转录文本生成标题")
-        title = generate_title(prompt=title_prompt, text=transcript)
-        
-        if title:
-            result["title"] = title
-            print(f"\n生成的标题: {title}")
-        else:
-            print("标题生成失败")
-        
-        return result
+        return finish_title(title_prompt, transcript)
 
     finally:
+        for step, seconds in timings.items():
+            print(f"[Timing] {result['mode']}.{step} 耗时 {seconds:.4f} 秒")
+
         # 清理中间文件
         if not keep_intermediate_files:
             # Check and delete audio file
@@ -1,13 +1,102 @@
-import whisper
 import time
 import os
 import logging
+import threading
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 
+# 与 Whisper 自身跳过无声片段的阈值一致
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+# 已加载的模型缓存，键为 (model_name, model_dir)，每个进程各自持有一份
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+
+def load_whisper_model(model_name="tiny", model_dir="models"):
+    """
+    加载 Whisper 模型并缓存在当前进程中，重复调用直接返回已加载的模型
+    
+    参数：
+        model_name: 模型名称，默认为 "tiny"
+        model_dir: 模型存储目录，默认为 "models"
+        
+    返回：
+        已加载的 Whisper 模型
+    """
+    key = (model_name, os.path.abspath(model_dir))
+    with _model_cache_lock:
+        model = _model_cache.get(key)
+        if model is None:
+            import whisper  # 延迟导入 torch/whisper，只用存储或生成标题的模块不需要加载
+            print(f"[Whisper] 正在加载 {model_name} 模型...")
+            model = whisper.load_model(model_name, download_root=model_dir)
+            _model_cache[key] = model
+            print(f"[Whisper] 模型加载完成，使用模型: {model_name}")
+    return model
+
+def has_speech(segments, no_speech_threshold=NO_SPEECH_THRESHOLD, logprob_threshold=LOGPROB_THRESHOLD):
+    """
+    根据 Whisper 片段的 no_speech_prob 和 avg_logprob 判断转录结果里是否有真实人声
+    纯音乐时 Whisper 常常“听出”并不存在的文本，这类片段无声概率高或置信度低
+    
+    参数：
+        segments: whisper_transcribe(return_segments=True) 返回的片段列表
+        
+    返回：
+        bool: 至少有一个片段像人声时为 True
+    """
+    for segment in segments or []:
+        no_speech_prob = segment.get("no_speech_prob", 0.0)
+        avg_logprob = segment.get("avg_logprob", 0.0)
+        if no_speech_prob <= no_speech_threshold and avg_logprob >= logprob_threshold:
+            return True
+    return False
+
+def detect_speech(audio_file, model_name="tiny", model_dir="models", language=None,
+                  no_speech_threshold=NO_SPEECH_THRESHOLD, windows=2):
+    """
+    只对音频开头（以及较长音频的中间）各 30 秒做一次短解码，用 no_speech_prob 判断有没有人声，
+    比完整转录便宜得多，用于在纯音乐/无人声时跳过 Whisper 转录
+    
+    参数：
+        audio_file: 音频文件路径
+        model_name: 模型名称，默认为 "tiny"
+        model_dir: 模型存储目录，默认为 "models"
+        language: 指定语言，None 为自动检测
+        windows: 最多检查的 30 秒窗口数
+        
+    返回：
+        bool: 检测到人声时为 True；检测出错时也返回 True，交给完整转录处理
+    """
+    start_time = time.time()
+    try:
+        import whisper
+        model = load_whisper_model(model_name, model_dir)
+        audio = whisper.load_audio(audio_file)
+        window = whisper.audio.N_SAMPLES  # 30 秒
+        starts = [0]
+        if windows > 1 and len(audio) > window:
+            starts.append((len(audio) - window) // 2)
+
+        options = whisper.DecodingOptions(language=language, without_timestamps=True, fp16=False, sample_len=8)
+        for start in starts:
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[start:start + window]),
+                                              model.dims.n_mels).to(model.device)
+            result = whisper.decode(model, mel, options)
+            print(f"[Whisper] 人声检测 {start / whisper.audio.SAMPLE_RATE:.0f}s 起: no_speech_prob={result.no_speech_prob:.2f}")
+            if result.no_speech_prob <= no_speech_threshold:
+                return True
+        return False
+    except Exception as e:
+        print(f"[Whisper] 人声检测出错，交由完整转录处理: {e}")
+        return True
+    finally:
+        print(f"[Whisper] 人声检测耗时: {time.time() - start_time:.2f} 秒")
+
 def whisper_transcribe(audio_file, model_name="tiny", model_dir="models", 
-                      language=None, sentence_count=None, fp16=False):
+                      language=None, sentence_count=None, fp16=False, return_segments=False):
     """
     使用 Whisper 模型将音频文件转换为文本，返回句子列表和完整文本
     
@@ -18,22 +107,26 @@ def whisper_transcribe(audio_file, model_name="tiny", model_dir="models",
         language: 指定语言，如 "zh"（中文），None 为自动检测
         sentence_count: 返回的句子数量，None 表示全部返回
         fp16: 是否使用半精度，CPU 上应设为 False
+        return_segments: 是否额外返回带时间戳的句子列表
         
     返回：
-        tuple: (完整文本, 句子列表, 执行时间)
+        tuple: (完整文本, 句子列表, 执行时间)；
+               return_segments 为 True 时为 (完整文本, 句子列表, 执行时间, 带时间戳的句子列表)，
+               其中每项为 {"start": 秒, "end": 秒, "text": 文本, "no_speech_prob", "avg_logprob"}
+        转录出错时完整文本为 None；成功但没有识别出语音时为空字符串
     """
     start_time = time.time()
     
     # 检查输入文件是否存在
     if not os.path.exists(audio_file):
         print(f"[Whisper] 错误：输入文件 {audio_file} 不存在")
+        if return_segments:
+            return None, None, 0, None
         return None, None, 0
         
     try:
-        # 加载模型
-        print(f"[Whisper] 正在加载 {model_name} 模型...")
-        model = whisper.load_model(model_name, download_root=model_dir)
-        print(f"[Whisper] 模型加载完成，使用模型: {model_name}")
+        # 加载模型（同一进程内只加载一次）
+        model = load_whisper_model(model_name, model_dir)
         
         # 转录音频
         print(f"[Whisper] 开始转录音频: {os.path.basename(audio_file)}")
@@ -54,6 +147,9 @@ def whisper_transcribe(audio_file, model_name="tiny", model_dir="models",
         
         # 提取句子列表
         sentences = [segment['text'] for segment in result['segments']]
+        segments = [{"start": segment['start'], "end": segment['end'], "text": segment['text'],
+                     "no_speech_prob": segment['no_speech_prob'], "avg_logprob": segment['avg_logprob']}
+                    for segment in result['segments']]
         
         # 限制句子数量
         if sentence_count and isinstance(sentence_count, int) and 0 < sentence_count < len(sentences):
@@ -71,12 +167,16 @@ def whisper_transcribe(audio_file, model_name="tiny", model_dir="models",
         print(f"[Whisper] 转录完成！得到 {len(sentences)} 个句子")
         print(f"[Whisper] 音频转文本耗时: {execution_time:.2f} 秒")
         
+        if return_segments:
+            return full_text, sentences, execution_time, segments
         return full_text, sentences, execution_time
     
     except Exception as e:
         end_time = time.time()
         print(f"[Whisper] 转录过程中发生错误: {e}")
         print(f"[Whisper] 尝试耗时: {end_time - start_time:.2f} 秒")
+        if return_segments:
+            return None, None, end_time - start_time, None
         return None, None, end_time - start_time
 
 if __name__ == "__main__":